@@ -26,9 +26,10 @@ from __future__ import annotations
 import os
 import random
 from datetime import datetime, timedelta
-from typing import Iterable, List, Tuple
+from typing import TYPE_CHECKING, Iterable, List, Tuple
 
-import pandas as pd
+if TYPE_CHECKING:             # pandas is imported lazily, see _pd()
+    import pandas as pd
 
 DATA_DIR = "data"             # folder with all S&P-500 CSVs
 _DEFAULT_NA = ["nan"]         # NA strings used in the CSVs
@@ -48,6 +49,22 @@ __all__ = [
     "rolling_volatility",
 ]
 
+# ---------------------------------------------------------------------
+# Lazy heavy imports
+# ---------------------------------------------------------------------
+def _pd():
+    """
+    Import pandas on first use and return the module.
+
+    Keeps `import get_portfolio` cheap for callers that only need the
+    pure-Python helpers (`symbol_to_path`, `random_subset`,
+    `random_end_date`).
+    """
+    import pandas
+
+    return pandas
+
+
 # ---------------------------------------------------------------------
 # I/O helpers (keep these fully implemented)
 # ---------------------------------------------------------------------
@@ -67,6 +84,7 @@ def read_stock_data(symbol: str) -> pd.DataFrame:
     Raises FileNotFoundError if the CSV is missing – the caller can catch
     this if desired.
     """
+    pd = _pd()
     fp = symbol_to_path(symbol)
     df = pd.read_csv(
         fp,
@@ -86,6 +104,7 @@ def _empty_df(dates: pd.DatetimeIndex) -> pd.DataFrame:
     """
     Build an empty DataFrame whose index is a DatetimeIndex aligned to `dates`.
     """
+    pd = _pd()
     idx = pd.to_datetime(dates)
     df = pd.DataFrame(index=idx)
     df.index.name = "Date"
@@ -112,6 +131,7 @@ def get_portfolio_join(
         raise ValueError(f"how must be one of {sorted(HOW_VALUES)}")
     # Placeholder behaviour: explain the missing implementation and return an empty DataFrame
 
+    pd = _pd()
     df_res = pd.DataFrame(index=dates)
 
     for symbol in symbols: 
@@ -135,6 +155,7 @@ def get_portfolio_concat(
     TODO: Use `pd.concat` to combine the list of symbol DataFrames along the
     specified axis, then reindex to `dates` so the final DataFrame has the same index.
     """
+    pd = _pd()
     symbol_dfs = []
     for symbol in symbols:
         symbol_df = read_stock_data(symbol)
@@ -163,6 +184,7 @@ def get_portfolio_merge(
         raise ValueError(f"how must be one of {sorted(HOW_VALUES)}")
     
     # empty DataFrame indexed by dates
+    pd = _pd()
     df_res = pd.DataFrame(index=dates)
     
     # Iteratively merge each symbol's DataFrame
@@ -294,6 +316,8 @@ def rolling_volatility(portfolio_df: pd.DataFrame, window: int = 5) -> pd.DataFr
 if __name__ == "__main__":
     # Example usage: build a portfolio and compute returns.
     # Note: These examples will fail until you implement the functions above.
+    import pandas as pd
+
     start, end = "2020-03-31", "2020-07-29"
     symbols_list = ["GOOG", "AAPL", "XOM", "AMZN", "GLD"]
     dates = pd.date_range(start, end)
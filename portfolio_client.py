@@ -0,0 +1,191 @@
+"""
+Thin client for `portfolio_daemon`, mirroring the `get_portfolio` API.
+
+The module-level functions keep the `get_portfolio` signatures, so
+`import portfolio_client as gp` is a drop-in replacement for the builders.
+`compute_*` and `rolling_volatility` accept either a DataFrame (computed
+locally, exactly as `get_portfolio` does) or a `Portfolio` spec from
+`portfolio(...)`, in which case the daemon builds and computes it and can
+serve the result from its cache.
+
+Each call opens a short-lived connection to the socket from
+`portfolio_protocol.default_socket_path()`; use `PortfolioClient(path)` to
+talk to a daemon elsewhere.
+
+Public API
+----------
+Portfolio / portfolio(symbols, dates[, builder, **kwargs])
+PortfolioClient([socket_path, timeout])
+get_portfolio_join(symbols, dates[, how])
+get_portfolio_concat(symbols, dates[, axis, join])
+get_portfolio_merge(symbols, dates[, how])
+compute_daily_returns(portfolio_df)
+compute_cumulative_returns(portfolio_df)
+rolling_volatility(portfolio_df[, window])
+"""
+from __future__ import annotations
+
+import json
+import pickle
+import socket
+from typing import TYPE_CHECKING, Iterable, NamedTuple, Union
+
+import get_portfolio
+from portfolio_protocol import (
+    STATUS_OK,
+    check_peer,
+    default_socket_path,
+    encode_dates,
+    recv_frame,
+    send_frame,
+)
+
+if TYPE_CHECKING:             # pandas is imported lazily, see get_portfolio._pd()
+    import pandas as pd
+
+_ERRORS = {
+    "ValueError": ValueError,
+    "KeyError": KeyError,
+    "FileNotFoundError": FileNotFoundError,
+    "TypeError": TypeError,
+}
+
+__all__ = [
+    "Portfolio",
+    "PortfolioClient",
+    "portfolio",
+    "get_portfolio_join",
+    "get_portfolio_concat",
+    "get_portfolio_merge",
+    "compute_daily_returns",
+    "compute_cumulative_returns",
+    "rolling_volatility",
+]
+
+
+# ---------------------------------------------------------------------
+# Portfolio spec
+# ---------------------------------------------------------------------
+class Portfolio(NamedTuple):
+    """
+    A portfolio described by its builder call rather than its data.
+    """
+    builder: str
+    symbols: tuple
+    dates: object
+    kwargs: dict
+
+    def to_request(self) -> dict:
+        return {
+            "builder": self.builder,
+            "symbols": list(self.symbols),
+            "dates": encode_dates(self.dates),
+            "kwargs": self.kwargs,
+        }
+
+
+def portfolio(symbols: Iterable[str], dates, *, builder: str = "join", **kwargs) -> Portfolio:
+    """
+    Describe `get_portfolio_<builder>(symbols, dates, **kwargs)` for the
+    daemon to build.
+    """
+    return Portfolio(builder, tuple(symbols), dates, kwargs)
+
+
+PortfolioLike = Union["pd.DataFrame", Portfolio]
+
+
+# ---------------------------------------------------------------------
+# Client
+# ---------------------------------------------------------------------
+class PortfolioClient:
+    """
+    Same functions as the module level, against an explicit socket.
+    """
+
+    def __init__(self, socket_path: str | None = None, timeout: float | None = 30.0):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+
+    def _call(self, op: str, spec: Portfolio, **args):
+        request = {"op": op, "portfolio": spec.to_request()}
+        if args:
+            request["args"] = args
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            check_peer(sock, self.socket_path)    # before trusting its pickles
+            send_frame(sock, json.dumps(request).encode("utf-8"))
+            frame = recv_frame(sock)
+        if frame is None:
+            raise ConnectionError("daemon closed the connection without replying")
+        status, payload = frame
+        if status == STATUS_OK:
+            return pickle.loads(payload)
+        name, _, msg = payload.decode("utf-8").partition(": ")
+        raise _ERRORS.get(name, RuntimeError)(msg)
+
+    # -----------------------------------------------------------------
+    # Portfolio builders
+    # -----------------------------------------------------------------
+    def get_portfolio_join(self, symbols, dates, *, how: str = "left") -> pd.DataFrame:
+        return self._call("portfolio", portfolio(symbols, dates, builder="join", how=how))
+
+    def get_portfolio_concat(
+        self, symbols, dates, *, axis: int = 1, join: str = "outer"
+    ) -> pd.DataFrame:
+        return self._call(
+            "portfolio", portfolio(symbols, dates, builder="concat", axis=axis, join=join)
+        )
+
+    def get_portfolio_merge(self, symbols, dates, *, how: str = "left") -> pd.DataFrame:
+        return self._call("portfolio", portfolio(symbols, dates, builder="merge", how=how))
+
+    # -----------------------------------------------------------------
+    # Analysis (DataFrame → local, Portfolio → daemon)
+    # -----------------------------------------------------------------
+    def compute_daily_returns(self, portfolio_df: PortfolioLike) -> pd.DataFrame:
+        if isinstance(portfolio_df, Portfolio):
+            return self._call("compute_daily_returns", portfolio_df)
+        return get_portfolio.compute_daily_returns(portfolio_df)
+
+    def compute_cumulative_returns(self, portfolio_df: PortfolioLike) -> pd.Series:
+        if isinstance(portfolio_df, Portfolio):
+            return self._call("compute_cumulative_returns", portfolio_df)
+        return get_portfolio.compute_cumulative_returns(portfolio_df)
+
+    def rolling_volatility(self, portfolio_df: PortfolioLike, window: int = 5) -> pd.DataFrame:
+        if isinstance(portfolio_df, Portfolio):
+            return self._call("rolling_volatility", portfolio_df, window=window)
+        return get_portfolio.rolling_volatility(portfolio_df, window=window)
+
+
+# ---------------------------------------------------------------------
+# Module-level mirror of get_portfolio
+# ---------------------------------------------------------------------
+def _client() -> PortfolioClient:
+    return PortfolioClient()
+
+
+def get_portfolio_join(symbols, dates, *, how: str = "left") -> pd.DataFrame:
+    return _client().get_portfolio_join(symbols, dates, how=how)
+
+
+def get_portfolio_concat(symbols, dates, *, axis: int = 1, join: str = "outer") -> pd.DataFrame:
+    return _client().get_portfolio_concat(symbols, dates, axis=axis, join=join)
+
+
+def get_portfolio_merge(symbols, dates, *, how: str = "left") -> pd.DataFrame:
+    return _client().get_portfolio_merge(symbols, dates, how=how)
+
+
+def compute_daily_returns(portfolio_df: PortfolioLike) -> pd.DataFrame:
+    return _client().compute_daily_returns(portfolio_df)
+
+
+def compute_cumulative_returns(portfolio_df: PortfolioLike) -> pd.Series:
+    return _client().compute_cumulative_returns(portfolio_df)
+
+
+def rolling_volatility(portfolio_df: PortfolioLike, window: int = 5) -> pd.DataFrame:
+    return _client().rolling_volatility(portfolio_df, window=window)
@@ -0,0 +1,455 @@
+"""
+Long-lived local daemon serving portfolio queries over a Unix socket.
+
+The daemon loads every `data/*.csv` once (via `PricePyramid`) and answers
+`get_portfolio_*`, `compute_*` and `rolling_volatility` requests from
+`portfolio_client`, so short-lived analysis processes stop re-parsing the
+same CSVs. See `portfolio_protocol` for the wire format.
+
+Request handling
+----------------
+* Finished results are kept, already pickled, in an LRU cache together
+  with the mtime/size of the CSV behind each of their symbols. A cached
+  result is served only while those CSVs still stat the same, so an edited,
+  deleted or recreated CSV is never served stale – whether or not the
+  pyramid knew the symbol. Each batch refreshes the pyramid first, which
+  also picks up CSVs added since startup.
+* A request identical to one still being computed waits on the same future
+  instead of starting a second computation.
+* New requests are collected for `batch_window` seconds and processed as a
+  batch. Requests in a batch that share a date index and use a
+  column-separable builder (left join/merge, outer concat along columns)
+  share a single panel built for the union of their symbols; each then
+  takes its own columns. Anything else falls back to the `get_portfolio`
+  builder itself.
+
+Run with `python portfolio_daemon.py [--socket PATH]`.
+
+Public API
+----------
+PortfolioDaemon([socket_path, batch_window, cache_size, symbols, cache_dir])
+PortfolioDaemon.submit(request)
+PortfolioDaemon.serve_forever()
+PortfolioDaemon.start()
+PortfolioDaemon.shutdown()
+"""
+from __future__ import annotations
+
+import argparse
+import errno
+import json
+import os
+import pickle
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import get_portfolio
+from portfolio_protocol import (
+    STATUS_ERROR,
+    STATUS_OK,
+    check_peer,
+    decode_dates,
+    default_socket_path,
+    recv_frame,
+    send_frame,
+)
+from price_pyramid import PricePyramid
+
+Stamps = Tuple[Optional[Tuple[int, int]], ...]
+
+BUILDERS = {
+    "join": get_portfolio.get_portfolio_join,
+    "concat": get_portfolio.get_portfolio_concat,
+    "merge": get_portfolio.get_portfolio_merge,
+}
+# Keyword arguments each builder accepts; anything else must reach the
+# builder so it raises TypeError exactly as a local call would.
+BUILDER_KWARGS = {
+    "join": {"how"},
+    "concat": {"axis", "join"},
+    "merge": {"how"},
+}
+OPS = {
+    "portfolio": lambda df, args: df,
+    "compute_daily_returns": lambda df, args: get_portfolio.compute_daily_returns(df),
+    "compute_cumulative_returns": lambda df, args: get_portfolio.compute_cumulative_returns(df),
+    "rolling_volatility": lambda df, args: get_portfolio.rolling_volatility(df, **args),
+}
+
+__all__ = [
+    "BUILDERS",
+    "BUILDER_KWARGS",
+    "OPS",
+    "PortfolioDaemon",
+]
+
+
+# ---------------------------------------------------------------------
+# Request helpers
+# ---------------------------------------------------------------------
+def _request_key(request: dict) -> str:
+    return json.dumps(request, sort_keys=True, separators=(",", ":"))
+
+
+def _validate(request: dict) -> None:
+    """
+    Raise ValueError for malformed requests before they reach a batch.
+    """
+    if request.get("op") not in OPS:
+        raise ValueError(f"op must be one of {sorted(OPS)}")
+    spec = request.get("portfolio")
+    if not isinstance(spec, dict) or spec.get("builder") not in BUILDERS:
+        raise ValueError(f"portfolio.builder must be one of {sorted(BUILDERS)}")
+    if not isinstance(spec.get("symbols"), list) or not isinstance(spec.get("dates"), dict):
+        raise ValueError("portfolio needs a 'symbols' list and a 'dates' object")
+
+
+# ---------------------------------------------------------------------
+# Daemon
+# ---------------------------------------------------------------------
+class PortfolioDaemon:
+    """
+    Result cache + request batcher in front of a `PricePyramid`.
+
+    `submit()` can be called directly (it is what the socket handler uses);
+    it returns a Future resolving to the pickled result. `cache_dir` is
+    passed through to the pyramid's on-disk level cache.
+    """
+
+    def __init__(
+        self,
+        socket_path: str | None = None,
+        *,
+        batch_window: float = 0.005,
+        cache_size: int = 256,
+        symbols=None,
+        cache_dir: str | None = None,
+    ):
+        self.socket_path = socket_path or default_socket_path(create=True)
+        self.batch_window = batch_window
+        self.cache_size = cache_size
+        self.pyramid = PricePyramid(symbols, cache_dir=cache_dir)
+        self.stats = {"requests": 0, "cache_hits": 0, "coalesced": 0, "panel_builds": 0}
+
+        self._cache: "OrderedDict[str, Tuple[bytes, Stamps]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._pending: List[Tuple[str, dict, Future]] = []
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._server: socketserver.UnixStreamServer | None = None
+        self._batcher = threading.Thread(target=self._batch_loop, daemon=True)
+        self._batcher.start()
+
+    # -----------------------------------------------------------------
+    # Submission / coalescing
+    # -----------------------------------------------------------------
+    def submit(self, request: dict) -> Future:
+        """
+        Queue `request` and return a Future for its pickled result.
+
+        Cached results resolve immediately unless one of the request's CSVs
+        changed since they were computed (one `stat` per symbol); a request
+        identical to one in flight shares that request's Future.
+        """
+        _validate(request)
+        key = _request_key(request)
+        stamps = self._stamps(request["portfolio"]["symbols"])
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("daemon is shutting down")
+            self.stats["requests"] += 1
+            entry = self._cache.get(key)
+            if entry is not None and entry[1] != stamps:
+                del self._cache[key]
+                entry = None
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                fut = Future()
+                fut.set_result(entry[0])
+                return fut
+            if key in self._inflight:
+                self.stats["coalesced"] += 1
+                return self._inflight[key]
+            fut = Future()
+            self._inflight[key] = fut
+            self._pending.append((key, request, fut))
+            self._cond.notify()
+        return fut
+
+    def _batch_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+            # Let concurrent callers join this batch.
+            time.sleep(self.batch_window)
+            with self._cond:
+                batch, self._pending = self._pending, []
+            try:
+                self._run_batch(batch)
+            except Exception as exc:          # fail the batch, keep serving
+                for key, _, fut in batch:
+                    self._settle(key, fut, exc=exc)
+
+    def _stamps(self, symbols: List[str]) -> Stamps:
+        """
+        `(st_mtime_ns, st_size)` of each symbol's CSV, None where missing.
+        """
+        stamps = []
+        for symbol in symbols:
+            try:
+                st = os.stat(get_portfolio.symbol_to_path(symbol, self.pyramid.base_dir))
+            except (OSError, TypeError, ValueError):
+                stamps.append(None)
+                continue
+            stamps.append((st.st_mtime_ns, st.st_size))
+        return tuple(stamps)
+
+    def _run_batch(self, batch: List[Tuple[str, dict, Future]]) -> None:
+        # Stamped before reading, so a CSV written mid-batch makes the
+        # cached result look stale rather than the other way round.
+        stamps = {key: self._stamps(request["portfolio"]["symbols"])
+                  for key, request, _ in batch}
+        self.pyramid.refresh()
+
+        panels = self._build_panels([request for _, request, _ in batch])
+        for key, request, fut in batch:
+            try:
+                df = panels[_request_key(request["portfolio"])]
+                if isinstance(df, Exception):
+                    raise df
+                result = OPS[request["op"]](df, request.get("args", {}))
+                payload = pickle.dumps(result, protocol=5)
+            except Exception as exc:          # reported to the client
+                self._settle(key, fut, exc=exc)
+                continue
+            self._settle(key, fut, payload=payload, stamps=stamps[key])
+
+    def _settle(self, key: str, fut: Future, *, payload: bytes | None = None,
+                stamps: Stamps = (), exc: Exception | None = None) -> None:
+        """
+        Resolve an in-flight request (caching `payload` with the CSV
+        `stamps` it was computed from on success), unless `_close()`
+        already failed it.
+        """
+        with self._cond:
+            self._inflight.pop(key, None)
+            if fut.done():
+                return
+            if exc is not None:
+                fut.set_exception(exc)
+                return
+            self._cache[key] = (payload, stamps)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            fut.set_result(payload)
+
+    # -----------------------------------------------------------------
+    # Panel building
+    # -----------------------------------------------------------------
+    def _separable(self, spec: dict) -> bool:
+        """
+        True if the builder's result for any symbol subset is just those
+        columns of the result for a superset (same dates), i.e. equal to
+        `panel(symbols).reindex(dates)`.
+
+        Not the case – so the real builder runs – for an empty symbol list
+        (concat raises), repeated symbols (join raises), a CSV with
+        repeated dates (join repeats rows where reindex raises), or keyword
+        arguments the builder does not take (it raises TypeError).
+        """
+        symbols, kwargs = spec["symbols"], spec.get("kwargs", {})
+        if not set(kwargs) <= BUILDER_KWARGS[spec["builder"]]:
+            return False
+        if not symbols or len(set(symbols)) != len(symbols):
+            return False
+        if not set(symbols) <= set(self.pyramid.symbols):
+            return False
+        if not all(self.pyramid.bars(s).index.is_unique for s in symbols):
+            return False
+        if spec["builder"] == "concat":
+            return kwargs.get("axis", 1) == 1 and kwargs.get("join", "outer") == "outer"
+        return kwargs.get("how", "left") == "left"
+
+    def _build_panels(self, requests: List[dict]) -> Dict[str, object]:
+        """
+        Map each distinct portfolio spec (by key) to its DataFrame, or to the
+        exception building it raised.
+        """
+        specs = {_request_key(r["portfolio"]): r["portfolio"] for r in requests}
+        groups: Dict[str, List[str]] = {}
+        panels: Dict[str, object] = {}
+        for skey, spec in specs.items():
+            if self._separable(spec):
+                groups.setdefault(_request_key(spec["dates"]), []).append(skey)
+                continue
+            try:
+                self.stats["panel_builds"] += 1
+                panels[skey] = BUILDERS[spec["builder"]](
+                    spec["symbols"], decode_dates(spec["dates"]), **spec.get("kwargs", {})
+                )
+            except Exception as exc:
+                panels[skey] = exc
+
+        for skeys in groups.values():
+            dates = decode_dates(specs[skeys[0]]["dates"])
+            union = list(dict.fromkeys(s for k in skeys for s in specs[k]["symbols"]))
+            self.stats["panel_builds"] += 1
+            shared = self.pyramid.panel(union).reindex(dates)
+            for skey in skeys:
+                panels[skey] = shared[specs[skey]["symbols"]]
+        return panels
+
+    # -----------------------------------------------------------------
+    # Socket server
+    # -----------------------------------------------------------------
+    def _make_server(self) -> socketserver.UnixStreamServer:
+        _remove_stale_socket(self.socket_path)
+        server = _Server(self.socket_path, _Handler)
+        # Only this user may connect; the directory and check_peer() guard
+        # the instant between bind and chmod.
+        os.chmod(self.socket_path, 0o600)
+        server.portfolio_daemon = self
+        self._server = server
+        return server
+
+    def serve_forever(self) -> None:
+        """
+        Serve on `socket_path` until `shutdown()` is called.
+        """
+        server = self._server or self._make_server()
+        try:
+            server.serve_forever()
+        finally:
+            self._close()
+
+    def start(self) -> threading.Thread:
+        """
+        Bind the socket and serve from a background thread.
+        """
+        self._make_server()
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self) -> None:
+        """
+        Stop serving, stop the batcher and remove the socket file.
+        """
+        server = self._server
+        if server is not None:
+            server.shutdown()
+        self._close()
+
+    def _close(self) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            server, self._server = self._server, None
+            # Handlers wait on these with no timeout; fail them rather than
+            # leave them hanging once the batcher is gone.
+            waiting = list(self._inflight.values()) + [f for _, _, f in self._pending]
+            self._inflight.clear()
+            self._pending.clear()
+            for fut in waiting:
+                if not fut.done():
+                    fut.set_exception(RuntimeError("daemon is shutting down"))
+        if server is not None:
+            server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+def _remove_stale_socket(path: str) -> None:
+    """
+    Unlink `path` if it is a socket nobody is listening on.
+
+    Raises OSError(EADDRINUSE) if a live daemon answers there, and
+    FileExistsError if `path` is not a socket at all.
+    """
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(st.st_mode):
+        raise FileExistsError(errno.EEXIST, "exists and is not a socket", path)
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:            # left behind by a dead daemon
+        os.unlink(path)
+        return
+    except BlockingIOError:                   # alive, backlog full
+        pass
+    finally:
+        probe.close()
+    raise OSError(errno.EADDRINUSE, "another daemon is already serving here", path)
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128          # many short-lived clients connect at once
+    portfolio_daemon: PortfolioDaemon
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """
+    Answer frames on one connection until the client closes it.
+    """
+
+    def handle(self) -> None:
+        daemon = self.server.portfolio_daemon
+        try:
+            check_peer(self.request, daemon.socket_path)
+        except PermissionError:
+            return                            # other users are not served
+        while True:
+            frame = recv_frame(self.request)
+            if frame is None:
+                return
+            try:
+                payload = daemon.submit(json.loads(frame[1])).result()
+            except Exception as exc:
+                msg = f"{type(exc).__name__}: {exc}".encode("utf-8")
+                send_frame(self.request, msg, STATUS_ERROR)
+                continue
+            send_frame(self.request, payload, STATUS_OK)
+
+
+# ---------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve portfolio queries over a Unix socket.")
+    parser.add_argument("--socket", default=None,
+                        help="socket path (default: $PORTFOLIO_DAEMON_SOCKET, "
+                             "$XDG_RUNTIME_DIR/portfolio-daemon.sock or "
+                             "<tmpdir>/portfolio-daemon-<uid>/portfolio-daemon.sock)")
+    parser.add_argument("--batch-window", type=float, default=0.005,
+                        help="seconds to collect requests into one batch")
+    args = parser.parse_args(argv)
+
+    daemon = PortfolioDaemon(args.socket, batch_window=args.batch_window)
+    print(f"Serving on {daemon.socket_path}")
+    # Exit through serve_forever's cleanup (removes the socket) on SIGTERM too.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
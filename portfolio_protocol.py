@@ -0,0 +1,189 @@
+"""
+Wire format shared by `portfolio_daemon` and `portfolio_client`.
+
+Every message is one frame::
+
+    b"PQD1" | status (1 byte) | payload length (4 bytes, big-endian) | payload
+
+Requests are sent with STATUS_OK and a UTF-8 JSON payload. Responses carry
+a pickled (protocol 5) result on STATUS_OK, or `"<ExcType>: <message>"` as
+UTF-8 on STATUS_ERROR.
+
+Only the daemon pickles; it never unpickles client input. Because the
+client does unpickle, both ends call `check_peer()` on every connection and
+refuse a peer running as another user. The default socket lives in a
+per-user directory: `$XDG_RUNTIME_DIR`, or a 0700 directory under the temp
+dir whose owner and mode are checked (`ensure_private_dir`).
+
+Public API
+----------
+send_frame(sock, payload[, status])
+recv_frame(sock)
+encode_dates(dates)
+decode_dates(obj)
+default_socket_path([create])
+ensure_private_dir(path)
+check_peer(sock, path)
+"""
+from __future__ import annotations
+
+import os
+import socket
+import stat
+import struct
+import tempfile
+from typing import TYPE_CHECKING, Iterable, Tuple
+
+if TYPE_CHECKING:             # pandas is imported lazily, see get_portfolio._pd()
+    import pandas as pd
+
+MAGIC = b"PQD1"
+STATUS_OK = 0
+STATUS_ERROR = 1
+_HEADER = struct.Struct(">4sBI")
+SOCKET_ENV = "PORTFOLIO_DAEMON_SOCKET"
+SOCKET_NAME = "portfolio-daemon.sock"
+
+__all__ = [
+    "MAGIC",
+    "STATUS_OK",
+    "STATUS_ERROR",
+    "send_frame",
+    "recv_frame",
+    "encode_dates",
+    "decode_dates",
+    "default_socket_path",
+    "ensure_private_dir",
+    "check_peer",
+]
+
+
+# ---------------------------------------------------------------------
+# Framing
+# ---------------------------------------------------------------------
+def send_frame(sock: socket.socket, payload: bytes, status: int = STATUS_OK) -> None:
+    """
+    Write one frame (header + payload) to `sock`.
+    """
+    sock.sendall(_HEADER.pack(MAGIC, status, len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("connection closed mid-frame")
+        buf += chunk
+    return bytes(buf)
+
+
+def recv_frame(sock: socket.socket) -> Tuple[int, bytes] | None:
+    """
+    Read one frame and return `(status, payload)`, or None on a clean EOF
+    before the header.
+
+    Raises ValueError if the magic bytes do not match.
+    """
+    first = sock.recv(_HEADER.size)
+    if not first:
+        return None
+    header = first + _recv_exact(sock, _HEADER.size - len(first))
+    magic, status, length = _HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError(f"bad frame magic {magic!r}")
+    return status, _recv_exact(sock, length)
+
+
+# ---------------------------------------------------------------------
+# Dates
+# ---------------------------------------------------------------------
+def encode_dates(dates: Iterable) -> dict:
+    """
+    JSON-safe form of a date index: ISO strings plus its freq and name, so
+    the daemon can rebuild an identical DatetimeIndex.
+    """
+    from get_portfolio import _pd
+
+    idx = _pd().DatetimeIndex(dates)
+    return {
+        "values": [ts.isoformat() for ts in idx],
+        "freq": idx.freqstr,
+        "name": idx.name,
+    }
+
+
+def decode_dates(obj: dict) -> pd.DatetimeIndex:
+    """
+    Inverse of `encode_dates`.
+    """
+    from get_portfolio import _pd
+
+    return _pd().DatetimeIndex(obj["values"], freq=obj["freq"], name=obj["name"])
+
+
+# ---------------------------------------------------------------------
+# Socket location
+# ---------------------------------------------------------------------
+def default_socket_path(create: bool = False) -> str:
+    """
+    `$PORTFOLIO_DAEMON_SOCKET`, else `$XDG_RUNTIME_DIR/portfolio-daemon.sock`,
+    else `<tmpdir>/portfolio-daemon-<uid>/portfolio-daemon.sock`.
+
+    With `create=True` the temp-dir fallback directory is created (0700)
+    and checked with `ensure_private_dir`.
+    """
+    if os.environ.get(SOCKET_ENV):
+        return os.environ[SOCKET_ENV]
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], SOCKET_NAME)
+    directory = os.path.join(tempfile.gettempdir(), f"portfolio-daemon-{os.getuid()}")
+    if create:
+        ensure_private_dir(directory)
+    return os.path.join(directory, SOCKET_NAME)
+
+
+def ensure_private_dir(path: str) -> None:
+    """
+    Create `path` with mode 0700 if missing, then check it is a real
+    directory owned by this user with no group/other access.
+
+    Raises PermissionError otherwise (e.g. another user created it first).
+    """
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(f"{path} must be a directory owned by uid "
+                              f"{os.getuid()} with mode 0700")
+
+
+# ---------------------------------------------------------------------
+# Peer check
+# ---------------------------------------------------------------------
+def _peer_uid(sock: socket.socket) -> int | None:
+    """
+    uid of the process at the other end of a Unix socket (Linux
+    SO_PEERCRED), or None where the platform does not provide it.
+    """
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _pid, uid, _gid = struct.unpack("3i", creds)
+    return uid
+
+
+def check_peer(sock: socket.socket, path: str) -> None:
+    """
+    Raise PermissionError unless the peer on `sock` runs as this user.
+
+    Uses SO_PEERCRED; elsewhere falls back to the owner of the socket file
+    at `path`.
+    """
+    uid = _peer_uid(sock)
+    if uid is None:
+        uid = os.stat(path).st_uid
+    if uid != os.getuid():
+        raise PermissionError(f"peer on {path} runs as uid {uid}, not {os.getuid()}")
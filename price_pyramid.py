@@ -0,0 +1,476 @@
+"""
+Multi-resolution price pyramid built from the CSVs in `data/`.
+
+For every symbol the pyramid keeps OHLC/Adj Close/Volume bars at three
+levels – daily (the raw CSV rows), weekly (W-FRI) and monthly. A coarse bar
+is indexed by the *last trading day* of its period, so its `Close` /
+`Adj Close` are exactly the daily values on that date.
+
+Queries are served from the coarsest level that gives the daily answer:
+a cumulative return between two trading days telescopes to the ratio of the
+prices on those days, so if both are week (or month) ends the weekly (or
+monthly) bars give the same result – up to float rounding – with far fewer
+rows. That only holds when the daily panel over the range has no NaNs:
+`compute_daily_returns` drops any row with a NaN in any column, so a gap in
+one symbol (a NaN price or a missing trading day) changes the daily result,
+and such ranges are answered from the daily level.
+
+The levels are persisted per symbol in `<base_dir>/.pyramid/<symbol>.pkl`
+together with the CSV's mtime/size and the byte offset parsed so far, so a
+new process loads them without touching the CSV. `refresh()` parses only
+the bytes appended since that offset and re-aggregates just the weekly /
+monthly periods they touch; any other edit to a CSV rebuilds that symbol.
+The cache is pickled – it is trusted exactly as much as `data/` itself.
+
+Public API
+----------
+PricePyramid(symbols[, base_dir, cache_dir])
+PricePyramid.refresh()
+PricePyramid.changed()
+PricePyramid.bars(symbol[, level])
+PricePyramid.panel(symbols[, level, start, end, field])
+PricePyramid.level_for(symbols, start, end)
+PricePyramid.returns(symbols[, level, start, end])
+PricePyramid.cumulative_returns(symbols[, start, end])
+PricePyramid.rolling_volatility(symbols[, level, window, start, end])
+"""
+from __future__ import annotations
+
+import io
+import os
+import pickle
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, List
+
+from get_portfolio import (
+    DATA_DIR,
+    _DEFAULT_NA,
+    _pd,
+    compute_cumulative_returns,
+    compute_daily_returns,
+    rolling_volatility,
+    symbol_to_path,
+)
+
+if TYPE_CHECKING:             # pandas is imported lazily, see get_portfolio._pd()
+    import pandas as pd
+
+LEVELS = ("daily", "weekly", "monthly")          # finest → coarsest
+PERIOD_CODES = {"weekly": "W-FRI", "monthly": "M"}
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+_AGG = {
+    "Open": "first",
+    "High": "max",
+    "Low": "min",
+    "Volume": "sum",
+}
+_LAST_ROW_COLUMNS = ["Close", "Adj Close"]   # taken from the period's last row
+CACHE_DIRNAME = ".pyramid"                   # under base_dir
+_CACHE_VERSION = 1
+_TAIL_BYTES = 4096            # bytes before the parsed offset checked on append
+
+__all__ = [
+    "LEVELS",
+    "PricePyramid",
+    "aggregate_bars",
+]
+
+
+# ---------------------------------------------------------------------
+# Aggregation
+# ---------------------------------------------------------------------
+def aggregate_bars(daily: pd.DataFrame, level: str) -> pd.DataFrame:
+    """
+    Aggregate daily OHLC bars to `level` ("weekly" or "monthly").
+
+    The result is indexed by the last trading day of each period, and its
+    `Close` / `Adj Close` are that day's values – NaN included – so a bar
+    never carries an earlier day's price under a later date.
+    """
+    if level not in PERIOD_CODES:
+        raise ValueError(f"level must be one of {sorted(PERIOD_CODES)}")
+    if daily.empty:
+        return daily.iloc[:0]
+
+    periods = daily.index.to_period(PERIOD_CODES[level])
+    grouped = daily.groupby(periods)
+    bars = grouped.agg(_AGG)
+    last_rows = grouped.nth(-1)       # last row of each period, NaNs kept
+    bars.index = last_rows.index
+    bars[_LAST_ROW_COLUMNS] = last_rows[_LAST_ROW_COLUMNS]
+    bars = bars[list(daily.columns)]
+    bars.index.name = "Date"
+    return bars
+
+
+def _parse_csv(data: bytes) -> pd.DataFrame:
+    """
+    Parse CSV bytes (header included) into OHLC bars with a Date index.
+    """
+    pd = _pd()
+    return pd.read_csv(
+        io.BytesIO(data),
+        index_col="Date",
+        parse_dates=True,
+        usecols=["Date", *PRICE_COLUMNS],
+        na_values=_DEFAULT_NA,
+    )
+
+
+def _concat_rows(head: pd.DataFrame, tail: pd.DataFrame) -> pd.DataFrame:
+    """
+    `head` followed by `tail`, with `head` cast to `tail`'s dtypes where it
+    has no NaNs – a half-written line re-parsed into `tail` may have widened
+    a column in `head` (e.g. an empty Volume turns it into float).
+    """
+    if tail.empty:
+        return head
+    fits = {col: dt for col, dt in tail.dtypes.items()
+            if head[col].dtype != dt and not head[col].isna().any()}
+    return _pd().concat([head.astype(fits), tail])
+
+
+# ---------------------------------------------------------------------
+# Pyramid
+# ---------------------------------------------------------------------
+class PricePyramid:
+    """
+    Daily/weekly/monthly bars for a set of symbols.
+
+    If `symbols` is None every `*.csv` under `base_dir` is loaded, and
+    `refresh()` picks up CSVs added later. `symbols` lists the symbols
+    whose CSV currently exists; one that disappears is dropped and comes
+    back if its CSV is recreated. Levels
+    are cached in `cache_dir` (default `<base_dir>/.pyramid`); if it cannot
+    be written the pyramid still works, in memory only.
+
+    Safe to share between threads: `refresh()` holds a lock that
+    `changed()`, `bars()` and `panel()` also take, so readers never see a
+    half-updated symbol.
+    """
+
+    def __init__(
+        self,
+        symbols: Iterable[str] | None = None,
+        base_dir: str = DATA_DIR,
+        *,
+        cache_dir: str | None = None,
+    ):
+        self.base_dir = base_dir
+        self.cache_dir = cache_dir or os.path.join(base_dir, CACHE_DIRNAME)
+        # None: track every CSV in base_dir, including ones added later.
+        self._wanted = None if symbols is None else list(symbols)
+        self.symbols: List[str] = []
+        self._levels: Dict[str, Dict[str, pd.DataFrame]] = {lvl: {} for lvl in LEVELS}
+        # Per symbol: CSV stamp, header bytes, byte offset parsed up to (a
+        # line boundary), rows before that offset and the bytes just before it.
+        self._state: Dict[str, dict] = {}
+        self._lock = threading.RLock()
+        self.refresh()
+
+    # -----------------------------------------------------------------
+    # Building / incremental update
+    # -----------------------------------------------------------------
+    def refresh(self) -> List[str]:
+        """
+        Bring every symbol up to date with its CSV.
+
+        Unchanged CSVs (same mtime/size) cost one `stat`. Appended rows are
+        parsed on their own and only re-aggregate the weekly/monthly
+        periods they fall into; any other change rebuilds that symbol from
+        scratch. A symbol whose CSV has disappeared is dropped from
+        `symbols` until the CSV comes back. Returns the symbols whose bars
+        were (re)loaded or dropped.
+        """
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> List[str]:
+        updated = []
+        candidates = self._candidates()
+        for symbol in candidates:
+            path = symbol_to_path(symbol, self.base_dir)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                if symbol in self._state:
+                    self._drop(symbol)
+                    updated.append(symbol)
+                continue
+            stamp = [st.st_mtime_ns, st.st_size]
+            state = self._state.get(symbol)
+            loaded = state is None and self._load_cache(symbol)
+            state = self._state.get(symbol)
+            if state is not None and state["stamp"] == stamp:
+                if loaded:
+                    updated.append(symbol)
+                continue
+
+            with open(path, "rb") as fh:
+                if state is not None and self._append_only(fh, state):
+                    fh.seek(state["offset"])
+                    self._append(symbol, fh.read(), stamp)
+                else:
+                    fh.seek(0)
+                    self._build(symbol, fh.read(), stamp)
+            self._save_cache(symbol)
+            updated.append(symbol)
+        for symbol in set(self._state) - set(candidates):   # CSV gone from a scan
+            self._drop(symbol)
+            updated.append(symbol)
+        self.symbols = [s for s in candidates if s in self._state]
+        return updated
+
+    def _candidates(self) -> List[str]:
+        if self._wanted is not None:
+            return list(self._wanted)
+        return sorted(
+            name[:-4] for name in os.listdir(self.base_dir) if name.endswith(".csv")
+        )
+
+    def _drop(self, symbol: str) -> None:
+        self._state.pop(symbol, None)
+        for level in LEVELS:
+            self._levels[level].pop(symbol, None)
+
+    def changed(self) -> List[str]:
+        """
+        Symbols whose CSV mtime/size differ from the loaded bars (`stat`
+        only – nothing is parsed). A loaded symbol whose CSV is missing, and
+        a CSV not loaded yet, count as changed.
+        """
+        with self._lock:
+            candidates, states = self._candidates(), dict(self._state)
+        stale = []
+        for symbol in candidates:
+            state = states.get(symbol)
+            try:
+                st = os.stat(symbol_to_path(symbol, self.base_dir))
+            except FileNotFoundError:
+                if state is not None:
+                    stale.append(symbol)
+                continue
+            if state is None or state["stamp"] != [st.st_mtime_ns, st.st_size]:
+                stale.append(symbol)
+        return stale
+
+    @staticmethod
+    def _append_only(fh, state: dict) -> bool:
+        """
+        True if the file still starts with the header and bytes already
+        parsed (checked on the header and the last `_TAIL_BYTES` of them).
+        """
+        header, tail, offset = state["header"], state["tail"], state["offset"]
+        if not header:
+            return False
+        if fh.read(len(header)) != header:
+            return False
+        fh.seek(offset - len(tail))
+        return fh.read(len(tail)) == tail
+
+    def _build(self, symbol: str, data: bytes, stamp: List[int]) -> None:
+        daily = _parse_csv(data)
+        header_end = data.find(b"\n") + 1
+        offset = max(data.rfind(b"\n") + 1, header_end)
+        partial = bool(data[offset:].strip())       # unterminated last line
+        self._levels["daily"][symbol] = daily
+        for level in PERIOD_CODES:
+            self._levels[level][symbol] = aggregate_bars(daily, level)
+        self._state[symbol] = {
+            "stamp": stamp,
+            "header": data[:header_end],
+            "offset": offset,
+            "rows": max(len(daily) - partial, 0),
+            "tail": data[max(header_end, offset - _TAIL_BYTES):offset],
+        }
+
+    def _append(self, symbol: str, data: bytes, stamp: List[int]) -> None:
+        """
+        Add the rows in `data` (the bytes after the parsed offset).
+
+        A previously unterminated last line is re-parsed from `data`. The
+        new state is published only after the levels it describes.
+        """
+        state = dict(self._state[symbol], stamp=stamp)
+        old = self._levels["daily"][symbol]
+        kept = old.iloc[: state["rows"]]
+        new = _parse_csv(state["header"] + data) if data.strip() else old.iloc[:0]
+
+        changed = list(old.index[state["rows"]:state["rows"] + 1])
+        if len(new):
+            changed.append(new.index.min())
+        cut = data.rfind(b"\n") + 1
+        state["offset"] += cut
+        state["tail"] = (state["tail"] + data[:cut])[-_TAIL_BYTES:]
+        state["rows"] = len(kept) + len(new) - bool(data[cut:].strip())
+        if not changed:
+            self._state[symbol] = state
+            return
+
+        daily = _concat_rows(kept, new)
+        self._levels["daily"][symbol] = daily
+        first_changed = min(changed)
+        for level, code in PERIOD_CODES.items():
+            # Drop the (possibly partial) periods touched by the new rows and
+            # re-aggregate just those from the daily bars.
+            period_start = first_changed.to_period(code).start_time
+            bars = self._levels[level][symbol]
+            fresh = aggregate_bars(daily[daily.index >= period_start], level)
+            self._levels[level][symbol] = _concat_rows(
+                bars[bars.index < period_start], fresh
+            )
+        self._state[symbol] = state
+
+    # -----------------------------------------------------------------
+    # On-disk cache
+    # -----------------------------------------------------------------
+    def _cache_path(self, symbol: str) -> str:
+        return os.path.join(self.cache_dir, f"{symbol}.pkl")
+
+    def _load_cache(self, symbol: str) -> bool:
+        try:
+            with open(self._cache_path(symbol), "rb") as fh:
+                blob = pickle.load(fh)
+        except Exception:                 # missing, corrupt or other pandas version
+            return False
+        if blob.get("version") != _CACHE_VERSION:
+            return False
+        for level in LEVELS:
+            self._levels[level][symbol] = blob["levels"][level]
+        self._state[symbol] = blob["state"]
+        return True
+
+    def _save_cache(self, symbol: str) -> None:
+        blob = {
+            "version": _CACHE_VERSION,
+            "state": self._state[symbol],
+            "levels": {level: self._levels[level][symbol] for level in LEVELS},
+        }
+        path = self._cache_path(symbol)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp, "wb") as fh:
+                pickle.dump(blob, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError:                   # read-only data dir: memory only
+            pass
+
+    # -----------------------------------------------------------------
+    # Lookups
+    # -----------------------------------------------------------------
+    def bars(self, symbol: str, level: str = "daily") -> pd.DataFrame:
+        """
+        Return the OHLC bars for one symbol at `level`.
+        """
+        if level not in LEVELS:
+            raise ValueError(f"level must be one of {list(LEVELS)}")
+        with self._lock:
+            return self._levels[level][symbol]
+
+    def panel(
+        self,
+        symbols: Iterable[str],
+        level: str = "daily",
+        *,
+        start=None,
+        end=None,
+        field: str = "Adj Close",
+    ) -> pd.DataFrame:
+        """
+        One column per symbol (same shape as `get_portfolio_join`) holding
+        `field` at `level`, restricted to bars dated in [start, end].
+        """
+        pd = _pd()
+        symbols = list(symbols)
+        with self._lock:                  # all columns from one refresh
+            cols = [self.bars(s, level)[field].rename(s) for s in symbols]
+        df = pd.concat(cols, axis=1) if cols else pd.DataFrame()
+        df.index.name = "Date"
+        return df.loc[start:end]
+
+    def _anchors(self, symbols: List[str], start, end):
+        """
+        First and last daily trading dates of the panel within [start, end].
+        """
+        idx = self.panel(symbols, "daily", start=start, end=end).index
+        if idx.empty:
+            raise ValueError("no trading days in the requested range")
+        return idx[0], idx[-1]
+
+    def level_for(self, symbols: Iterable[str], start=None, end=None) -> str:
+        """
+        Coarsest level whose bar dates include both the first and last
+        trading day in [start, end] for every symbol.
+
+        "daily" whenever the daily panel over that range has a NaN – a NaN
+        price, or a trading day one symbol lacks – since the NaN rows
+        `compute_daily_returns` drops break the telescoping product.
+        """
+        symbols = list(symbols)
+        first, last = self._anchors(symbols, start, end)
+        if self.panel(symbols, "daily", start=first, end=last).isna().any().any():
+            return "daily"
+        for level in reversed(LEVELS):
+            if all(
+                first in self.bars(s, level).index and last in self.bars(s, level).index
+                for s in symbols
+            ):
+                return level
+        return "daily"
+
+    # -----------------------------------------------------------------
+    # Queries
+    # -----------------------------------------------------------------
+    def returns(
+        self,
+        symbols: Iterable[str],
+        level: str = "daily",
+        *,
+        start=None,
+        end=None,
+    ) -> pd.DataFrame:
+        """
+        Per-period returns at `level` (see `compute_daily_returns`).
+        """
+        return compute_daily_returns(self.panel(symbols, level, start=start, end=end))
+
+    def cumulative_returns(self, symbols: Iterable[str], start=None, end=None) -> pd.Series:
+        """
+        Cumulative return between the first and last trading day in
+        [start, end], served from `level_for(symbols, start, end)`.
+        """
+        symbols = list(symbols)
+        first, last = self._anchors(symbols, start, end)
+        level = self.level_for(symbols, first, last)
+        return compute_cumulative_returns(self.panel(symbols, level, start=first, end=last))
+
+    def rolling_volatility(
+        self,
+        symbols: Iterable[str],
+        level: str = "daily",
+        *,
+        window: int = 5,
+        start=None,
+        end=None,
+    ) -> pd.DataFrame:
+        """
+        Rolling std of per-period returns at `level` (see `rolling_volatility`).
+        """
+        return rolling_volatility(
+            self.panel(symbols, level, start=start, end=end), window=window
+        )
+
+
+# ---------------------------------------------------------------------
+# Manual demo
+# ---------------------------------------------------------------------
+if __name__ == "__main__":
+    pyramid = PricePyramid(["GOOG", "AAPL", "XOM", "AMZN", "GLD"])
+    syms = pyramid.symbols
+
+    print("Monthly bars (GOOG):\n", pyramid.bars("GOOG", "monthly").head())
+    print("\nLevel for 2020-01-31..2020-06-30:", pyramid.level_for(syms, "2020-01-31", "2020-06-30"))
+    print("\nCumulative returns:\n", pyramid.cumulative_returns(syms, "2020-01-31", "2020-06-30"))
+    print("\n4-week rolling volatility (tail):\n",
+          pyramid.rolling_volatility(syms, "weekly", window=4).tail())
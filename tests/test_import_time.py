@@ -0,0 +1,61 @@
+"""
+Import-time budget – fails when importing `get_portfolio` or the other
+lightweight entry points in MODULES starts pulling in heavy dependencies
+again.
+
+Each module is imported in a fresh interpreter under `python -X importtime`
+and its cumulative import time (µs) is compared against a budget. Override
+the budget with `IMPORT_BUDGET_US` on slow CI machines.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BUDGET_US = int(os.environ.get("IMPORT_BUDGET_US", "100000"))   # 100 ms
+HEAVY_MODULES = {"pandas", "numpy", "matplotlib"}
+MODULES = ["get_portfolio", "get_daily_rate", "price_pyramid", "portfolio_client"]
+
+
+# ---------------------------------------------------------------------
+# Fixtures/helpers
+# ---------------------------------------------------------------------
+def _importtime(module: str) -> dict:
+    """
+    Return `{module_name: cumulative_us}` for every module imported by
+    `import <module>` in a fresh interpreter.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split(":", 1)[1].split("|")
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+
+# ---------------------------------------------------------------------
+# Startup budget
+# ---------------------------------------------------------------------
+@pytest.mark.parametrize("module", MODULES)
+def test_no_heavy_imports(module):
+    imported = {name.split(".")[0] for name in _importtime(module)}
+    assert not imported & HEAVY_MODULES
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_import_time_budget(module):
+    cumulative_us = _importtime(module)[module]
+    assert cumulative_us < BUDGET_US, (
+        f"import {module} took {cumulative_us} µs (budget {BUDGET_US} µs)"
+    )
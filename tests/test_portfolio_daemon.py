@@ -0,0 +1,287 @@
+"""
+Portfolio daemon – results must match `get_portfolio`, and concurrent
+requests must share work.
+"""
+import os
+import shutil
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+import get_portfolio
+import portfolio_protocol
+from portfolio_client import PortfolioClient, portfolio
+from portfolio_daemon import PortfolioDaemon
+from portfolio_protocol import decode_dates, encode_dates, ensure_private_dir
+
+SYMS = ["GOOG", "AAPL"]
+DATES = pd.date_range("2020-03-31", "2020-07-29")
+
+
+# ---------------------------------------------------------------------
+# Fixtures/helpers
+# ---------------------------------------------------------------------
+@pytest.fixture
+def daemon(tmp_path):
+    d = PortfolioDaemon(str(tmp_path / "pq.sock"), batch_window=0.05,
+                        cache_dir=str(tmp_path / "pyramid"))
+    d.start()
+    yield d
+    d.shutdown()
+
+
+@pytest.fixture
+def client(daemon):
+    return PortfolioClient(daemon.socket_path)
+
+
+def _parallel(fn, args_list):
+    barrier = threading.Barrier(len(args_list))
+
+    def run(args):
+        barrier.wait()
+        return fn(*args)
+
+    with ThreadPoolExecutor(len(args_list)) as pool:
+        return list(pool.map(run, args_list))
+
+
+# ---------------------------------------------------------------------
+# Wire format
+# ---------------------------------------------------------------------
+def test_dates_round_trip():
+    pd.testing.assert_index_equal(decode_dates(encode_dates(DATES)), DATES)
+    assert decode_dates(encode_dates(DATES)).freq == DATES.freq
+
+
+def test_private_dir(tmp_path):
+    private = tmp_path / "sock-dir"
+    ensure_private_dir(str(private))
+    assert os.stat(private).st_mode & 0o777 == 0o700
+
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    os.chmod(shared, 0o777)
+    with pytest.raises(PermissionError):
+        ensure_private_dir(str(shared))
+
+
+def test_client_refuses_foreign_peer(client, monkeypatch):
+    monkeypatch.setattr(portfolio_protocol, "_peer_uid", lambda sock: os.getuid() + 1)
+    with pytest.raises(PermissionError):
+        client.get_portfolio_join(SYMS, DATES)
+
+
+def test_second_daemon_refuses_live_socket(daemon, client):
+    other = PortfolioDaemon(daemon.socket_path, cache_dir=daemon.pyramid.cache_dir)
+    with pytest.raises(OSError, match="already serving"):
+        other.start()
+    other.shutdown()
+    # the first daemon still owns the socket
+    assert client.get_portfolio_join(SYMS, DATES).shape == (len(DATES), len(SYMS))
+
+
+def test_stale_socket_replaced(tmp_path):
+    path = str(tmp_path / "pq.sock")
+    dead = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    dead.bind(path)
+    dead.close()                              # socket file left behind
+
+    d = PortfolioDaemon(path, cache_dir=str(tmp_path / "pyramid"))
+    d.start()
+    try:
+        assert os.stat(path).st_mode & 0o777 == 0o600
+        assert PortfolioClient(path).get_portfolio_join(SYMS, DATES).shape[1] == 2
+    finally:
+        d.shutdown()
+
+
+# ---------------------------------------------------------------------
+# Results match get_portfolio
+# ---------------------------------------------------------------------
+@pytest.mark.parametrize("name, kwargs", [
+    ("get_portfolio_join", {}),
+    ("get_portfolio_join", {"how": "inner"}),
+    ("get_portfolio_concat", {}),
+    ("get_portfolio_merge", {}),
+])
+def test_builders_match(client, name, kwargs):
+    expected = getattr(get_portfolio, name)(SYMS, DATES, **kwargs)
+    pd.testing.assert_frame_equal(getattr(client, name)(SYMS, DATES, **kwargs), expected)
+
+
+def test_compute_matches(client):
+    local = get_portfolio.get_portfolio_join(SYMS, DATES)
+    spec = portfolio(SYMS, DATES)
+    pd.testing.assert_frame_equal(client.compute_daily_returns(spec),
+                                  get_portfolio.compute_daily_returns(local))
+    pd.testing.assert_series_equal(client.compute_cumulative_returns(spec),
+                                   get_portfolio.compute_cumulative_returns(local))
+    pd.testing.assert_frame_equal(client.rolling_volatility(spec, window=20),
+                                  get_portfolio.rolling_volatility(local, window=20))
+
+
+def test_empty_symbols_match(client):
+    with pytest.raises(ValueError, match="No objects to concatenate"):
+        get_portfolio.get_portfolio_concat([], DATES)
+    with pytest.raises(ValueError, match="No objects to concatenate"):
+        client.get_portfolio_concat([], DATES)
+    pd.testing.assert_frame_equal(client.get_portfolio_join([], DATES),
+                                  get_portfolio.get_portfolio_join([], DATES))
+
+
+def test_duplicate_csv_dates_match(tmp_path, monkeypatch):
+    shutil.copytree("data", tmp_path / "data", ignore=shutil.ignore_patterns(".*"))
+    src = pd.read_csv(tmp_path / "data" / "GOOG.csv")
+    pd.concat([src, src.iloc[[60]]]).to_csv(tmp_path / "data" / "DUP.csv", index=False)
+    monkeypatch.chdir(tmp_path)
+
+    d = PortfolioDaemon(str(tmp_path / "pq.sock"))
+    d.start()
+    try:
+        client = PortfolioClient(d.socket_path)
+        for name in ("get_portfolio_join", "get_portfolio_merge"):
+            expected = getattr(get_portfolio, name)(["DUP", "AAPL"], DATES)
+            pd.testing.assert_frame_equal(getattr(client, name)(["DUP", "AAPL"], DATES),
+                                          expected)
+        with pytest.raises(ValueError):
+            client.get_portfolio_concat(["DUP"], DATES)
+    finally:
+        d.shutdown()
+
+
+def test_errors_propagate(client):
+    with pytest.raises(ValueError):
+        client.get_portfolio_join(SYMS, DATES, how="sideways")
+    for spec in (portfolio(["GOOG"], DATES, builder="concat", how="left"),
+                 portfolio(["GOOG"], DATES, builder="join", axis=0)):
+        with pytest.raises(TypeError):
+            client._call("portfolio", spec)
+    with pytest.raises(FileNotFoundError):
+        client.get_portfolio_join(["NOPE"], DATES)
+
+
+# ---------------------------------------------------------------------
+# Caching / coalescing
+# ---------------------------------------------------------------------
+def test_identical_requests_coalesced(daemon, client):
+    spec = portfolio(SYMS, DATES)
+    results = _parallel(client.compute_daily_returns, [(spec,)] * 8)
+    assert daemon.stats["panel_builds"] == 1
+    assert daemon.stats["coalesced"] + daemon.stats["cache_hits"] == 7
+    for df in results[1:]:
+        pd.testing.assert_frame_equal(df, results[0])
+
+
+def test_overlapping_requests_share_panel(daemon, client):
+    symbol_sets = [["GOOG", "AAPL"], ["AAPL", "XOM"], ["XOM", "GOOG", "IBM"]]
+    results = _parallel(client.get_portfolio_join, [(s, DATES) for s in symbol_sets])
+    assert daemon.stats["panel_builds"] == 1
+    for syms, df in zip(symbol_sets, results):
+        pd.testing.assert_frame_equal(df, get_portfolio.get_portfolio_join(syms, DATES))
+
+
+def test_repeat_served_from_cache(daemon, client):
+    client.get_portfolio_merge(SYMS, DATES)
+    client.get_portfolio_merge(SYMS, DATES)
+    assert daemon.stats["cache_hits"] == 1
+    assert daemon.stats["panel_builds"] == 1
+
+
+def test_csv_edit_invalidates_cache(tmp_path, monkeypatch):
+    shutil.copytree("data", tmp_path / "data", ignore=shutil.ignore_patterns(".*"))
+    monkeypatch.chdir(tmp_path)
+    d = PortfolioDaemon(str(tmp_path / "pq.sock"), batch_window=0.01)
+    d.start()
+    try:
+        client = PortfolioClient(d.socket_path)
+        before = client.get_portfolio_join(["GOOG"], DATES)
+        assert abs(before.loc["2020-04-01", "GOOG"] - 55.218162) < 1e-6
+
+        src = pd.read_csv("data/GOOG.csv")
+        src.loc[src["Date"] == "2020-04-01", "Adj Close"] = 999.0
+        src.to_csv("data/GOOG.csv", index=False)
+
+        after = client.get_portfolio_join(["GOOG"], DATES)
+        assert after.loc["2020-04-01", "GOOG"] == 999.0
+    finally:
+        d.shutdown()
+
+
+def test_vanished_csv_only_fails_its_symbol(tmp_path, monkeypatch):
+    shutil.copytree("data", tmp_path / "data", ignore=shutil.ignore_patterns(".*"))
+    monkeypatch.chdir(tmp_path)
+    d = PortfolioDaemon(str(tmp_path / "pq.sock"))
+    d.start()
+    try:
+        client = PortfolioClient(d.socket_path)
+        os.remove(tmp_path / "data" / "XOM.csv")
+        with pytest.raises(FileNotFoundError):
+            client.get_portfolio_join(["XOM"], DATES)
+        pd.testing.assert_frame_equal(client.get_portfolio_join(SYMS, DATES),
+                                      get_portfolio.get_portfolio_join(SYMS, DATES))
+    finally:
+        d.shutdown()
+
+
+def test_csv_added_after_startup_tracked(tmp_path, monkeypatch):
+    shutil.copytree("data", tmp_path / "data", ignore=shutil.ignore_patterns(".*"))
+    monkeypatch.chdir(tmp_path)
+    d = PortfolioDaemon(str(tmp_path / "pq.sock"), batch_window=0.01)
+    d.start()
+    try:
+        client = PortfolioClient(d.socket_path)
+        shutil.copy("data/GOOG.csv", "data/NEW.csv")
+        pd.testing.assert_frame_equal(client.get_portfolio_join(["NEW"], DATES),
+                                      get_portfolio.get_portfolio_join(["NEW"], DATES))
+        assert "NEW" in d.pyramid.symbols
+
+        src = pd.read_csv("data/NEW.csv")
+        src["Adj Close"] = 1.0
+        src.to_csv("data/NEW.csv", index=False)
+        after = client.get_portfolio_join(["NEW"], DATES)
+        assert (after["NEW"].dropna() == 1.0).all()
+    finally:
+        d.shutdown()
+
+
+def test_recreated_csv_tracked(tmp_path, monkeypatch):
+    shutil.copytree("data", tmp_path / "data", ignore=shutil.ignore_patterns(".*"))
+    monkeypatch.chdir(tmp_path)
+    d = PortfolioDaemon(str(tmp_path / "pq.sock"), batch_window=0.01)
+    d.start()
+    try:
+        client = PortfolioClient(d.socket_path)
+        original = client.get_portfolio_join(["XOM"], DATES)
+        saved = (tmp_path / "data" / "XOM.csv").read_bytes()
+
+        os.remove("data/XOM.csv")
+        with pytest.raises(FileNotFoundError):
+            client.get_portfolio_join(["XOM"], DATES)
+
+        (tmp_path / "data" / "XOM.csv").write_bytes(saved)
+        pd.testing.assert_frame_equal(client.get_portfolio_join(["XOM"], DATES), original)
+        assert "XOM" in d.pyramid.symbols
+
+        src = pd.read_csv("data/XOM.csv")
+        src["Adj Close"] = 1.0
+        src.to_csv("data/XOM.csv", index=False)
+        after = client.get_portfolio_join(["XOM"], DATES)
+        assert (after["XOM"].dropna() == 1.0).all()
+    finally:
+        d.shutdown()
+
+
+def test_shutdown_fails_waiting_requests(tmp_path):
+    request = {"op": "portfolio", "portfolio": portfolio(SYMS, DATES).to_request()}
+    d = PortfolioDaemon(str(tmp_path / "pq.sock"), batch_window=5,
+                        cache_dir=str(tmp_path / "pyramid"))
+    fut = d.submit(request)
+    d.shutdown()
+    with pytest.raises(RuntimeError, match="shutting down"):
+        fut.result(timeout=1)
+    with pytest.raises(RuntimeError):
+        d.submit(request)
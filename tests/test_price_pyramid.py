@@ -0,0 +1,244 @@
+"""
+Price pyramid – coarse levels must agree with the daily data (up to float
+rounding, see RTOL).
+"""
+import shutil
+import sys
+import threading
+
+import pandas as pd
+import pytest
+
+from get_portfolio import compute_cumulative_returns, get_portfolio_join
+import price_pyramid
+from price_pyramid import PricePyramid, aggregate_bars
+
+SYMS = ["GOOG", "AAPL", "XOM"]
+RTOL = 1e-12                  # coarse vs daily products differ only by rounding
+
+
+# ---------------------------------------------------------------------
+# Fixtures/helpers
+# ---------------------------------------------------------------------
+@pytest.fixture(scope="module")
+def pyramid(tmp_path_factory):
+    return PricePyramid(SYMS, cache_dir=str(tmp_path_factory.mktemp("pyramid")))
+
+
+# ---------------------------------------------------------------------
+# Aggregation
+# ---------------------------------------------------------------------
+def test_weekly_bars_match_resample(pyramid):
+    daily = pyramid.bars("GOOG")
+    weekly = pyramid.bars("GOOG", "weekly")
+    expected = daily.resample("W-FRI").agg(
+        {"Open": "first", "High": "max", "Low": "min",
+         "Close": "last", "Adj Close": "last", "Volume": "sum"}
+    ).dropna()
+    assert list(weekly["High"]) == list(expected["High"])
+    assert list(weekly["Adj Close"]) == list(expected["Adj Close"])
+    # bars are dated on the last trading day of the period
+    assert weekly.index[-1] == daily.index[-1]
+
+
+def test_nan_close_not_carried_forward(tmp_path):
+    src = pd.read_csv("data/AAPL.csv")
+    src.loc[src["Date"] == "2020-01-31", "Adj Close"] = float("nan")
+    src.to_csv(tmp_path / "AAPL.csv", index=False)
+
+    pyr = PricePyramid(["AAPL"], base_dir=str(tmp_path))
+    monthly = pyr.bars("AAPL", "monthly")
+    assert pd.isna(monthly.loc["2020-01-31", "Adj Close"])
+    # a NaN anchor price can only be answered from the daily level
+    assert pyr.level_for(["AAPL"], "2020-01-31", "2020-06-30") == "daily"
+    assert pyr.level_for(["AAPL"], "2020-02-28", "2020-06-30") == "monthly"
+
+
+def test_unknown_level_rejected(pyramid):
+    with pytest.raises(ValueError):
+        pyramid.bars("GOOG", "hourly")
+
+
+# ---------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------
+@pytest.mark.parametrize("start, end, level", [
+    ("2020-01-31", "2020-06-30", "monthly"),   # both month ends
+    ("2020-03-06", "2020-05-15", "weekly"),    # both Fridays
+    ("2020-03-04", "2020-05-13", "daily"),     # mid-week
+])
+def test_cumulative_returns_exact(pyramid, start, end, level):
+    assert pyramid.level_for(SYMS, start, end) == level
+    daily = pyramid.panel(SYMS, start=start, end=end)
+    expected = compute_cumulative_returns(daily)
+    got = pyramid.cumulative_returns(SYMS, start, end)
+    pd.testing.assert_series_equal(got, expected, check_names=False, rtol=RTOL)
+
+
+def _gapped_pyramid(tmp_path, edit):
+    """PricePyramid over a tmp copy of SYMS after `edit(symbol, frame)`."""
+    for sym in SYMS:
+        src = edit(sym, pd.read_csv(f"data/{sym}.csv"))
+        src.to_csv(tmp_path / f"{sym}.csv", index=False)
+    return PricePyramid(SYMS, base_dir=str(tmp_path))
+
+
+@pytest.mark.parametrize("edit", [
+    # NaN price inside the range
+    lambda sym, df: df.assign(**{"Adj Close": df["Adj Close"].where(
+        ~((sym == "AAPL") & (df["Date"] == "2020-03-17")))}),
+    # one symbol missing a trading day the others have
+    lambda sym, df: df[~((sym == "XOM") & (df["Date"] == "2020-04-14"))],
+], ids=["nan-inside", "missing-day"])
+def test_cumulative_returns_gap_falls_back_to_daily(tmp_path, edit):
+    pyr = _gapped_pyramid(tmp_path, edit)
+    start, end = "2020-01-31", "2020-06-30"
+    assert pyr.level_for(SYMS, start, end) == "daily"
+    expected = compute_cumulative_returns(pyr.panel(SYMS, start=start, end=end))
+    pd.testing.assert_series_equal(pyr.cumulative_returns(SYMS, start, end), expected,
+                                   check_names=False, rtol=RTOL)
+
+
+def test_panel_matches_join(pyramid):
+    dates = pyramid.bars("GOOG").index[:10]
+    expected = get_portfolio_join(SYMS, dates)
+    pd.testing.assert_frame_equal(pyramid.panel(SYMS).iloc[:10], expected,
+                                  check_freq=False)
+
+
+# ---------------------------------------------------------------------
+# Incremental update
+# ---------------------------------------------------------------------
+@pytest.fixture
+def parsed_bytes(monkeypatch):
+    """Record the size of every chunk of CSV bytes the pyramid parses."""
+    sizes = []
+    real = price_pyramid._parse_csv
+
+    def spy(data):
+        sizes.append(len(data))
+        return real(data)
+
+    monkeypatch.setattr(price_pyramid, "_parse_csv", spy)
+    return sizes
+
+
+def _assert_same_levels(pyr, full, symbol="GOOG"):
+    for level in ("daily", "weekly", "monthly"):
+        pd.testing.assert_frame_equal(pyr.bars(symbol, level),
+                                      full.bars(symbol, level))
+
+
+def test_refresh_parses_only_appended_rows(tmp_path, parsed_bytes):
+    raw = open("data/GOOG.csv", "rb").read()
+    cut = raw.rfind(b"\n", 0, len(raw) - 600) + 1
+    (tmp_path / "GOOG.csv").write_bytes(raw[:cut])
+
+    pyr = PricePyramid(["GOOG"], base_dir=str(tmp_path))
+    assert pyr.refresh() == []
+
+    with open(tmp_path / "GOOG.csv", "ab") as fh:
+        fh.write(raw[cut:])
+    parsed_bytes.clear()
+    assert pyr.refresh() == ["GOOG"]
+    assert len(parsed_bytes) == 1 and parsed_bytes[0] < 1000   # header + tail
+
+    _assert_same_levels(pyr, PricePyramid(["GOOG"], cache_dir=str(tmp_path / "full")))
+
+
+def test_refresh_completes_unterminated_line(tmp_path):
+    raw = open("data/GOOG.csv", "rb").read()
+    (tmp_path / "GOOG.csv").write_bytes(raw[:-20])     # last line cut short
+
+    pyr = PricePyramid(["GOOG"], base_dir=str(tmp_path))
+    (tmp_path / "GOOG.csv").write_bytes(raw)
+    pyr.refresh()
+    _assert_same_levels(pyr, PricePyramid(["GOOG"], cache_dir=str(tmp_path / "full")))
+
+
+def test_refresh_rebuilds_on_edit(tmp_path):
+    shutil.copy("data/GOOG.csv", tmp_path / "GOOG.csv")
+    pyr = PricePyramid(["GOOG"], base_dir=str(tmp_path))
+
+    src = pd.read_csv(tmp_path / "GOOG.csv")
+    src.loc[0, "Adj Close"] = 999.0
+    src.to_csv(tmp_path / "GOOG.csv", index=False)
+    assert pyr.refresh() == ["GOOG"]
+    assert pyr.bars("GOOG").iloc[0]["Adj Close"] == 999.0
+
+
+class _CheckedState(dict):
+    """`_state` that records any symbol state published without a stamp."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.incomplete = []
+
+    def __setitem__(self, symbol, state):
+        if "stamp" not in state:
+            self.incomplete.append(symbol)
+        super().__setitem__(symbol, state)
+
+
+def test_state_published_complete(tmp_path):
+    raw = open("data/GOOG.csv", "rb").read()
+    cut = raw.rfind(b"\n", 0, len(raw) // 2) + 1
+    (tmp_path / "GOOG.csv").write_bytes(raw[:cut])
+    pyr = PricePyramid(["GOOG"], base_dir=str(tmp_path))
+    pyr._state = checked = _CheckedState(pyr._state)
+
+    (tmp_path / "GOOG.csv").write_bytes(raw)              # append
+    pyr.refresh()
+    (tmp_path / "GOOG.csv").write_bytes(raw[:cut])        # rebuild
+    pyr.refresh()
+    assert checked.incomplete == []
+
+
+def test_readers_during_refresh(tmp_path):
+    raw = open("data/GOOG.csv", "rb").read()
+    cut = raw.rfind(b"\n", 0, len(raw) // 2) + 1
+    (tmp_path / "GOOG.csv").write_bytes(raw)
+    pyr = PricePyramid(None, base_dir=str(tmp_path))
+    errors, done = [], threading.Event()
+
+    def read():
+        while not done.is_set():
+            try:
+                pyr.changed()
+                pyr.panel(pyr.symbols)
+            except Exception as exc:
+                errors.append(exc)
+                return
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)               # interleave threads aggressively
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for t in readers:
+        t.start()
+    try:
+        for i in range(20):
+            # alternately truncate (rebuild) and re-append (incremental)
+            (tmp_path / "GOOG.csv").write_bytes(raw[:cut] if i % 2 else raw)
+            pyr.refresh()
+    finally:
+        done.set()
+        for t in readers:
+            t.join()
+        sys.setswitchinterval(interval)
+    assert errors == []
+
+
+def test_levels_persisted(tmp_path, parsed_bytes):
+    shutil.copy("data/GOOG.csv", tmp_path / "GOOG.csv")
+    first = PricePyramid(["GOOG"], base_dir=str(tmp_path))
+    assert (tmp_path / ".pyramid" / "GOOG.pkl").exists()
+
+    parsed_bytes.clear()
+    second = PricePyramid(["GOOG"], base_dir=str(tmp_path))
+    assert parsed_bytes == []
+    _assert_same_levels(second, first)
+
+
+def test_aggregate_bars_empty(pyramid):
+    empty = pyramid.bars("GOOG").iloc[:0]
+    assert aggregate_bars(empty, "monthly").empty